@@ -5,10 +5,11 @@
 # GPLv3, see LICENSE
 #
 
-from typing import Dict, Any, Callable, Union, Tuple, Iterator
+from typing import Dict, List, Any, Callable, Union, Tuple, Iterator
 
 import json
-import base64
+import orjson
+import pybase64
 import re
 
 import decimal
@@ -16,6 +17,7 @@ from decimal import *
 
 from enum import Enum
 from collections import defaultdict
+from functools import lru_cache
 
 from .exceptions import ErrorDomain, most_severe
 from .settings import Workarounds
@@ -23,7 +25,12 @@ from .settings import Workarounds
 from texttable import Texttable
 
 
+DEBUG_DUMP = False  # enable for dumping all properties on failed checks
+
+
 class MaybeDecimal:
+	__slots__ = ('_d', )
+
 	def __init__(self, s: Union[str, Decimal, 'MaybeDecimal'] = None):
 		if isinstance(s, MaybeDecimal):
 			self._d = s._d
@@ -55,7 +62,20 @@ class MaybeDecimal:
 		if s[0]:
 			return MaybeDecimal(s[1])
 		else:
-			return MaybeDecimal()
+			return _INVALID
+
+
+_INVALID = MaybeDecimal()
+
+
+def as_maybe_decimal(x: Union[str, Decimal, MaybeDecimal, None]) -> MaybeDecimal:
+	# MaybeDecimals are never modified, so existing instances can be passed through as is.
+	if type(x) is MaybeDecimal:
+		return x
+	elif x is None:
+		return _INVALID
+	else:
+		return MaybeDecimal(x)
 
 
 def _dump_properties(properties: Dict[str, str], report: Callable[[str], None]):
@@ -74,6 +94,18 @@ def _dump_properties(properties: Dict[str, str], report: Callable[[str], None]):
 		report(line)
 
 
+def _report_rows(header: List[str], rows: List[List[str]], widths: List[int], report: Callable[[str], None]):
+	# a much cheaper alternative to Texttable for large tables. cells are padded, but never
+	# wrapped or truncated.
+	def format_row(row):
+		return " ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+
+	report(format_row(header))
+	report("=" * (sum(widths) + len(widths) - 1))
+	for row in rows:
+		report(format_row(row))
+
+
 def _flat(x: Any) -> Any:
 	if isinstance(x, tuple):
 		for y in x:
@@ -83,6 +115,31 @@ def _flat(x: Any) -> Any:
 		yield x
 
 
+@lru_cache(maxsize=4096)
+def _flat_key(args: Tuple) -> Tuple:
+	return tuple(_flat(args))
+
+
+_WS_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def _normalize_title(title: str) -> str:
+	return _WS_RE.sub('', title)
+
+
+def _is_answer_key(k: Tuple) -> bool:
+	return len(k) > 3 and k[0] == "question" and k[2] == "answer"
+
+
+def _encode_json_default(x: Any) -> Any:
+	# called by orjson for values it cannot serialize natively. MaybeDecimals are tagged so that
+	# Result._deserialized_properties() can restore them.
+	if isinstance(x, MaybeDecimal):
+		return "MaybeDecimal", x.encode()
+	raise TypeError
+
+
 def _normalize_json(s: str) -> str:
 	try:
 		return json.dumps(json.loads(s))
@@ -96,7 +153,7 @@ class Origin(Enum):
 
 
 def _round_to_2_digits(x: Union[Decimal, MaybeDecimal], r: str) -> MaybeDecimal:
-	x = MaybeDecimal(x)
+	x = as_maybe_decimal(x)
 	if x.valid():
 		return MaybeDecimal(x.to_decimal().quantize(Decimal("0.01"), rounding=r))
 	else:
@@ -106,11 +163,14 @@ def _round_to_2_digits(x: Union[Decimal, MaybeDecimal], r: str) -> MaybeDecimal:
 class Result:
 	@staticmethod
 	def key(*args) -> Tuple:
-		return tuple(_flat(args))
+		for arg in args:
+			if isinstance(arg, tuple):
+				return _flat_key(args)
+		return args  # already flat
 
 	@staticmethod
 	def normalize_question_title(title: str) -> str:
-		return re.sub(r'\s+', '', title)
+		return _normalize_title(title)
 
 	@staticmethod
 	def reached_score_keys(question_title: str) -> Iterator[Tuple]:
@@ -151,14 +211,7 @@ class Result:
 	def scores(self, channel: str = "xls") -> Iterator[MaybeDecimal]:
 		for k, v in self.properties.items():
 			if len(k) == 4 and k[0] == channel and k[1] == "question" and k[3] == "score_reached":
-				yield MaybeDecimal(v)
-
-	def _serialized_properties(self) -> Iterator[Tuple]:
-		for k, v in self.properties.items():
-			if isinstance(v, MaybeDecimal):
-				yield k, ("MaybeDecimal", v.encode())
-			else:
-				yield k, v
+				yield as_maybe_decimal(v)
 
 	@staticmethod
 	def _deserialized_properties(items) -> Dict:
@@ -175,13 +228,15 @@ class Result:
 	def __init__(self, from_json: str = None, **kwargs):
 		from ..question.coverage import Coverage
 
+		self._answer_index = None
+
 		if from_json:
-			data = json.loads(from_json)
+			data = orjson.loads(from_json)
 			self.origin = Origin[data["origin"]]
 			self.properties = self._deserialized_properties((tuple(key), value) for key, value in data["properties"])
 			self.types = dict((tuple(key), value) for key, value in data["types"])
 			self.protocol = data["protocol"]
-			self.files = dict((k, base64.b64decode(v)) for k, v in data["files"].items())
+			self.files = dict((k, pybase64.b64decode(v, validate=False)) for k, v in data["files"].items())
 			self.performance = data["performance"]
 			self.errors = data["errors"]
 			self.coverage = Coverage(from_dict=data["coverage"])
@@ -195,16 +250,18 @@ class Result:
 			self.errors = dict()
 			self.coverage = Coverage()
 
-	def to_json(self):
-		return json.dumps(dict(
+	def to_json(self) -> str:
+		return orjson.dumps(dict(
 			origin=self.origin.name,
-			properties=list(self._serialized_properties()),
+			properties=list(self.properties.items()),
 			types=list(self.types.items()),
 			protocol=self.protocol,
-			files=dict((k, base64.b64encode(v).decode('utf8')) for k, v in self.files.items()),
+			files=dict((k, pybase64.b64encode_as_string(v)) for k, v in self.files.items()),
 			performance=self.performance,
 			errors=self.errors,
-			coverage=self.coverage.as_dict()))
+			coverage=self.coverage.as_dict()),
+			default=_encode_json_default,
+			option=orjson.OPT_NON_STR_KEYS).decode('utf8')
 
 	def get_origin(self):
 		return self.origin
@@ -216,18 +273,40 @@ class Result:
 		self.properties[key] = value
 		if value_type:
 			self.types[key] = value_type
+		self._index_answer(key, value)
 
 	def update(self, key: Tuple, value: Union[str, Decimal]):
 		assert key in self.properties
 		if isinstance(value, Decimal):
 			value = str(value)  # make it safe for JSON
 		self.properties[key] = value
+		self._index_answer(key, value)
 
 	def remove(self, key: Tuple):
 		if key in self.properties:
 			del self.properties[key]
+			if self._answer_index is not None and _is_answer_key(key):
+				del self._answer_index[key[1]][key[3:]]
+
+	def _get_answer_index(self) -> Dict[str, Dict[Tuple, Any]]:
+		# maps ("question", title, "answer", *dimensions) keys to index[title][dimensions]. built
+		# lazily on first use and then kept up to date by add(), update() and remove().
+		if self._answer_index is None:
+			index = dict()
+			for k, v in self.properties.items():
+				if _is_answer_key(k):
+					index.setdefault(k[1], dict())[k[3:]] = v
+			self._answer_index = index
+		return self._answer_index
+
+	def _index_answer(self, key: Tuple, value):
+		if self._answer_index is not None and _is_answer_key(key):
+			self._answer_index.setdefault(key[1], dict())[key[3:]] = value
 
 	def gather(self, key: Tuple):
+		if len(key) == 3 and key[0] == "question" and key[2] == "answer":
+			return dict(self._get_answer_index().get(key[1], dict()))
+
 		answers = dict()
 		for k, v in self.properties.items():
 			if k[:len(key)] == key:
@@ -263,11 +342,9 @@ class Result:
 
 	def get_answers(self) -> Dict[str, Dict]:
 		answers = defaultdict(dict)
-		for p, value in self.properties.items():
-			if p[0] == "question" and p[2] == "answer":
-				question_title = p[1]
-				dimension = p[3]
-				answers[question_title][dimension] = value
+		for question_title, dimensions in self._get_answer_index().items():
+			for dimension, value in dimensions.items():
+				answers[question_title][dimension[0]] = value
 		return answers
 
 	def check_against(self, other: 'Result', report: Callable[[str], None], workarounds: Workarounds) -> bool:
@@ -279,20 +356,17 @@ class Result:
 		keys = sorted(list(set(
 			list(self_properties.keys()) + list(other_properties.keys()))))
 
-		table = Texttable()
-		table.set_deco(Texttable.HEADER)
-		table.set_cols_dtype(['t', 't', 't', 't'])
-		table.header(['OK?', 'KEY', self.get_origin().name.upper(), other.get_origin().name.upper()])
-		table.set_cols_width([10, 60, 20, 20])
-		table.set_header_align(['l', 'l', 'l', 'l'])
+		header = ['OK?', 'KEY', self.get_origin().name.upper(), other.get_origin().name.upper()]
+		widths = [10, 60, 20, 20]
+		rows = []
 
 		def ignore_key(k: Tuple) -> bool:
 			return k[0] == "results_tab" and workarounds.ignore_wrong_results_in_results_tab
 
 		def make_is_close(eps: Decimal = Decimal("0.01")):
 			def is_close(a: Union[str, MaybeDecimal], b: Union[str, MaybeDecimal]) -> bool:
-				a = MaybeDecimal(a)
-				b = MaybeDecimal(b)
+				a = as_maybe_decimal(a)
+				b = as_maybe_decimal(b)
 
 				if not a.valid() or not b.valid():
 					return False
@@ -313,16 +387,19 @@ class Result:
 			comparators[("statistics_tab", "percentage_reached")] = make_is_close()
 			comparators[("results_tab", "percentage_reached")] = make_is_close()
 
+		normalize = workarounds.normalize
+		get_type = self.types.get
+
 		for k in keys:
 			value_self = "%s" % self_properties.get(k, None)
 			value_other = "%s" % other_properties.get(k, None)
 
-			type_self = self.types.get(k, None)
-			type_other = self.types.get(k, None)
+			type_self = get_type(k, None)
+			type_other = get_type(k, None)
 			types = tuple(set(t for t in (type_self, type_other) if t is not None))
 
-			value_self = workarounds.normalize(value_self)
-			value_other = workarounds.normalize(value_other)
+			value_self = normalize(value_self)
+			value_other = normalize(value_other)
 
 			if types == ('json',):
 				value_self = _normalize_json(value_self)
@@ -340,17 +417,16 @@ class Result:
 				status = "FAIL"
 				all_ok = False
 
-			table.add_row([
+			rows.append([
 				status,
 				" / ".join(k),
 				value_self.replace("\n", "\\n"),
 				value_other.replace("\n", "\\n")
 			])
 
-		for line in table.draw().split("\n"):
-			report(line)
+		_report_rows(header, rows, widths, report)
 
-		if False:  # enable for further debugging
+		if DEBUG_DUMP:
 			if not all_ok:
 				report("\n")
 				report("full dump of properties of %s:" % self.get_origin().name.upper())
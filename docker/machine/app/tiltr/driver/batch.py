@@ -620,14 +620,12 @@ class Run:
 				new_scores_table.add_row([question_title, score])
 
 				answers_table.add_row(["QUESTION " + question_title, ""])
-				for key, value in result.properties.items():
-					if key[0] == "question" and key[1] == question_title and key[2] == "answer":
-						dimensions = key[3:]
-						if len(dimensions) == 1:
-							dimension = str(dimensions[0])
-						else:
-							dimension = str(list(map(lambda x: '"%s"' % str(x), dimensions)))
-						answers_table.add_row([dimension, value])
+				for dimensions, value in result.gather(("question", question_title, "answer")).items():
+					if len(dimensions) == 1:
+						dimension = str(dimensions[0])
+					else:
+						dimension = str(list(map(lambda x: '"%s"' % str(x), dimensions)))
+					answers_table.add_row([dimension, value])
 				answers_table.add_row(["", ""])
 
 			if any_readjusted:
@@ -13,6 +13,8 @@ import time
 import json
 import traceback
 
+from concurrent.futures import ThreadPoolExecutor
+
 
 def verify_hello(machine):
 	for retries in range(5):
@@ -27,23 +29,33 @@ def verify_hello(machine):
 	return False
 
 
-def detect_machines():
-	i = 1
+def _safe_resolve(hostname):
+	for t in range(3):
+		try:
+			return socket.gethostbyname(hostname)
+		except socket.gaierror:
+			pass
+	return None
+
+
+def detect_machines(batch_size=64):
+	# machines are numbered contiguously starting with 1. resolve their names in concurrent
+	# batches and stop at the first name that does not resolve.
 
 	machines = dict()
-	while True:
-		ip = None
-		for t in range(3):
-			try:
-				ip = socket.gethostbyname('tiltr_machine_%d' % i)
-			except socket.gaierror:
-				time.sleep(0.1)
-		if ip is None:
-			break
-		machines['machine_%d' % i] = ip
-		i += 1
 
-	return machines
+	with ThreadPoolExecutor(max_workers=32) as executor:
+		i = 1
+		while True:
+			indices = range(i, i + batch_size)
+			ips = executor.map(_safe_resolve, ['tiltr_machine_%d' % j for j in indices])
+
+			for j, ip in zip(indices, ips):
+				if ip is None:
+					return machines
+				machines['machine_%d' % j] = ip
+
+			i += batch_size
 
 
 class Machines:
@@ -70,11 +82,16 @@ class Machines:
 
 		print("waiting for machines to start up.")
 
+		responsive = dict()
+
 		try:
-			responsive = dict()
-			for name, ip in machines.items():
-				if verify_hello(ip):
-					responsive[name] = ip
+			# probe all machines concurrently, so that startup takes as long as the slowest
+			# machine and not the sum of all of them.
+			with ThreadPoolExecutor(max_workers=max(len(machines), 1)) as executor:
+				hellos = executor.map(verify_hello, machines.values())
+				for (name, ip), ok in zip(machines.items(), hellos):
+					if ok:
+						responsive[name] = ip
 		except:
 			traceback.print_exc()
 
@@ -130,7 +130,7 @@ class ClozeAnswer(Answer):
 		answers = dict()
 		for gap in self.question.gaps.values():
 			value = self.current_answers[gap.index]
-			if gap.get_type() == ClozeType.text:
+			if gap.type == ClozeType.text:
 				value = context.implicit_text_to_number(value)
 
 				# apply implicit_text_to_number twice here, as ILIAS converts numbers to
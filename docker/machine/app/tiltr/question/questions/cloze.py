@@ -13,9 +13,10 @@ import json
 from enum import Enum
 from decimal import *
 from collections import defaultdict, namedtuple
+from itertools import accumulate
 
 import selenium
-from selenium.common.exceptions import NoSuchElementException, ElementNotVisibleException
+from selenium.common.exceptions import ElementNotVisibleException
 from selenium.webdriver.support.select import Select
 from texttable import Texttable
 
@@ -56,12 +57,17 @@ def _max_entry_size(size: int, context: 'TestContext') -> int:
 		return int(context.settings.max_cloze_text_length)
 
 
+# cumulative weights are accumulated exactly as random.choices() would do it from the
+# plain weights (0.5, 0.2, 0.1, 0.1, 0.1), so that the drawn modes stay the same.
+_MODIFY_ANSWER_MODES = ("unmodified", "randchar", "randcase", "randperm", "randfull")
+_MODIFY_ANSWER_CUM_WEIGHTS = tuple(accumulate((0.5, 0.2, 0.1, 0.1, 0.1)))
+
+
 def _modify_answer(text: str, context: 'TestContext', max_len:int = None):
 	max_len = _max_entry_size(max_len, context)
 
 	mode = context.random.choices(
-		("unmodified", "randchar", "randcase", "randperm", "randfull"),
-		weights=(0.5, 0.2, 0.1, 0.1, 0.1))[0]
+		_MODIFY_ANSWER_MODES, cum_weights=_MODIFY_ANSWER_CUM_WEIGHTS)[0]
 
 	if mode == "unmodified":
 		# keep exactly as specified.
@@ -72,18 +78,16 @@ def _modify_answer(text: str, context: 'TestContext', max_len:int = None):
 	elif mode == "randfull":
 		return context.produce_text(max_len, context.cloze_random_chars)
 	else:
-		# modify case or content.
-		chars = []
-		for i in range(len(text)):
-			r = context.random.random()
-			if mode == "randchar" and r < 0.2:
-				chars.append(context.random.choice(context.cloze_random_chars))
-			elif mode == "randcase" and r < 0.2:
-				chars.append(text[i].swapcase())
-			else:
-				chars.append(text[i])
-		text = "".join(chars)
-		return text
+		# modify case or content. note that random numbers need to get drawn in exactly this
+		# order (one random() per character, followed by a choice() if it's replaced), so that
+		# regression contexts keep producing the same answers.
+		random = context.random.random
+		if mode == "randchar":
+			choice = context.random.choice
+			random_chars = context.cloze_random_chars
+			return "".join(choice(random_chars) if random() < 0.2 else c for c in text)
+		else:  # randcase
+			return "".join(c.swapcase() if random() < 0.2 else c for c in text)
 
 
 def _readjust_score(random, score:Decimal):
@@ -197,6 +201,7 @@ class ClozeComparator(Enum):
 
 class ClozeQuestionGap:
 	index: int
+	type: ClozeType
 
 	_export_names = dict(de="Lücke", en="Gap")
 
@@ -214,13 +219,25 @@ class ClozeQuestionGap:
 
 
 class ClozeQuestionTextGap(ClozeQuestionGap):
+	type = ClozeType.text
+
 	def __init__(self, scoring: ClozeScoring, index: int):
 		ClozeQuestionGap.__init__(self, index)
 		self.comparator = scoring.comparator
 		gap_scoring = scoring.gaps[index]
 		self.options = gap_scoring.options
+		self._option_items = tuple(self.options.items())
+		self._option_keys = frozenset(self.options)
 		self.size = gap_scoring.size  # maximum size
 
+		if self.comparator == ClozeComparator.ignore_case:
+			# several options might fold to the same text; the best score wins. as in the case
+			# sensitive lookup, texts not matching any option score 0, as do negative options.
+			self._folded_options = dict()
+			for option, score in self.options.items():
+				folded = option.casefold()
+				self._folded_options[folded] = max(self._folded_options.get(folded, Decimal(0)), score)
+
 	def get_maximum_score(self) -> Decimal:
 		return max(self.options.values())
 
@@ -239,7 +256,7 @@ class ClozeQuestionTextGap(ClozeQuestionGap):
 		value = str(value)
 		for args in coverage.text_cases_occurred(value):
 			coverage.case_occurred(question, self.index, channel, *args)
-		if value in self.options:
+		if value in self._option_keys:
 			coverage.case_occurred(question, self.index, channel, "solution", value)
 
 	def _modify_answer(self, text: str, context: 'TestContext'):
@@ -249,7 +266,7 @@ class ClozeQuestionTextGap(ClozeQuestionGap):
 	def get_random_choice(self, context: 'TestContext'):
 		if context.random.random() < float(context.settings.cloze_text_enter_scored_p) and not context.prefer_text():
 			# pick scored answer.
-			text, _ = context.random.choice(list(self.options.items()))
+			text, _ = context.random.choice(self._option_items)
 			return self._modify_answer(text, context)
 		else:
 			# make up something random and probably wrong.
@@ -271,12 +288,11 @@ class ClozeQuestionTextGap(ClozeQuestionGap):
 			return self.options.get(text, Decimal(0))
 
 		assert self.comparator == ClozeComparator.ignore_case
-		best_score = Decimal(0)
-		for option, score in self.options.items():
-			if option.casefold() == text.casefold():
-				best_score = max(best_score, score)
+		return self._folded_options.get(text.casefold(), Decimal(0))
 
-		return best_score
+	def get_score_from_folded(self, folded_text: str) -> Decimal:
+		# same as get_score() for ignore_case, with text already casefolded by the caller.
+		return self._folded_options.get(folded_text, Decimal(0))
 
 	def get_scored_options(self):
 		return self.options
@@ -288,13 +304,17 @@ class ClozeQuestionTextGap(ClozeQuestionGap):
 			return len(value) <= self.size
 
 	def get_type(self):
-		return ClozeType.text
+		return self.type
 
 
 class ClozeQuestionSelectGap(ClozeQuestionGap):
+	type = ClozeType.select
+
 	def __init__(self, scoring: ClozeScoring, index: int):
 		ClozeQuestionGap.__init__(self, index)
 		self.options = scoring.gaps[index].options
+		self._option_items = tuple(self.options.items())
+		self._option_keys = frozenset(self.options)
 
 	def get_maximum_score(self) -> Decimal:
 		return max(self.options.values())
@@ -309,7 +329,7 @@ class ClozeQuestionSelectGap(ClozeQuestionGap):
 		coverage.case_occurred(question, self.index, channel, value)
 
 	def get_random_choice(self, context):
-		return context.random.choice(list(self.options.items()))
+		return context.random.choice(self._option_items)
 
 	def get_score(self, text: str, context: 'TestContext') -> Decimal:
 		return self.options.get(text, Decimal(0))
@@ -318,10 +338,10 @@ class ClozeQuestionSelectGap(ClozeQuestionGap):
 		return self.options
 
 	def is_valid_answer(self, value: str) -> bool:
-		return value in self.options
+		return value in self._option_keys
 
 	def get_type(self):
-		return ClozeType.select
+		return self.type
 
 
 def num_fract_digits(x):
@@ -330,7 +350,14 @@ def num_fract_digits(x):
 		return 0
 	return len(s) - s.index('.') - 1
 
+
+# printf formats for the usual significant digits returned by ClozeQuestionNumericGap._num_digits.
+_NUMBER_FORMATS = dict((digits, '%%.%dg' % digits) for digits in (14, 16))
+
+
 class ClozeQuestionNumericGap(ClozeQuestionGap):
+	type = ClozeType.numeric
+
 	def __init__(self, scoring: ClozeScoring, index: int):
 		ClozeQuestionGap.__init__(self, index)
 
@@ -341,6 +368,17 @@ class ClozeQuestionNumericGap(ClozeQuestionGap):
 		self.numeric_upper = gap_scoring.upper
 		self.score = gap_scoring.score
 
+		self._float_value = float(self.numeric_value)
+		self._float_lower = float(self.numeric_lower)
+		self._float_upper = float(self.numeric_upper)
+		self._float_range = float(self.numeric_upper - self.numeric_lower)
+
+		# "@" coverage cases, i.e. the value and its bounds at all possible roundings.
+		self._coverage_points = frozenset(
+			"@" + str(round(x, i))
+			for x in (self._float_value, self._float_lower, self._float_upper)
+			for i in range(1 + num_fract_digits(x)))
+
 	def _num_digits(self, context: 'TestContext') -> int:
 		if context.ilias_version >= (5, 4, 2):
 			# starting with ILIAS 5.4.2, ILIAS switched to 14 digits accuracy
@@ -351,32 +389,26 @@ class ClozeQuestionNumericGap(ClozeQuestionGap):
 			return 16
 
 	def _format_number(self, n, context):
-		format = '%.' + str(self._num_digits(context)) + 'g'  # e.g. %.14
-		return format % n
+		digits = self._num_digits(context)
+		return (_NUMBER_FORMATS.get(digits) or '%%.%dg' % digits) % n
 
 	def get_maximum_score(self) -> Decimal:
 		return self.score
 
 	def initialize_coverage(self, question, coverage, context):
-		def add_at(x):
-			x = float(x)
-			for i in range(1 + num_fract_digits(x)):
-				coverage.add_case(question, self.index, mode, "@" + str(round(x, i)))
-
 		for mode in ("verify", "export"):
 			coverage.add_case(question, self.index, mode, "empty")
 			coverage.add_case(question, self.index, mode, "not_a_number")
 
-			add_at(self.numeric_value)
-			add_at(self.numeric_lower)
-			add_at(self.numeric_upper)
+			for point in self._coverage_points:
+				coverage.add_case(question, self.index, mode, point)
 
 			coverage.add_case(question, self.index, mode, "below")
 			coverage.add_case(question, self.index, mode, "above")
 
-			if float(self.numeric_lower) < float(self.numeric_value):
+			if self._float_lower < self._float_value:
 				coverage.add_case(question, self.index, mode, "inside_lower_range")
-			if float(self.numeric_upper) > float(self.numeric_value):
+			if self._float_upper > self._float_value:
 				coverage.add_case(question, self.index, mode, "inside_upper_range")
 
 			coverage.add_case(question, self.index, mode, "positive")
@@ -394,46 +426,39 @@ class ClozeQuestionNumericGap(ClozeQuestionGap):
 				occured = "not_a_number"
 
 		if occured is None:
-			if float(value) < 0.:
+			x = float(value)
+
+			if x < 0.:
 				coverage.case_occurred(question, self.index, channel, "negative")
-			elif float(value) > 0.:
+			elif x > 0.:
 				coverage.case_occurred(question, self.index, channel, "positive")
 
-			if float(value) < float(self.numeric_lower):
+			if x < self._float_lower:
 				occured = "below"
-			elif float(value) > float(self.numeric_upper):
+			elif x > self._float_upper:
 				occured = "above"
-			elif float(value) > float(self.numeric_value) and float(value) < float(self.numeric_upper):
+			elif self._float_value < x < self._float_upper:
 				occured = "inside_upper_range"
-			elif float(value) < float(self.numeric_value) and float(value) > float(self.numeric_lower):
+			elif self._float_lower < x < self._float_value:
 				occured = "inside_lower_range"
 			else:
-				def is_coverage_item(candidate, x):
-					x = float(x)
-					for i in range(1 + num_fract_digits(x)):
-						if candidate == str(round(x, i)):
-							return True
-
-				candidate = str(float(value))
-				for x in (self.numeric_value, self.numeric_lower, self.numeric_upper):
-					if is_coverage_item(candidate, x):
-						occured = "@" + candidate
-						break
+				point = "@" + str(x)
+				if point in self._coverage_points:
+					occured = point
 
 		if occured:
 			coverage.case_occurred(question, self.index, channel, occured)
 
 	def _get_random_inside(self, context: 'TestContext') -> float:
-		return context.random.uniform(float(self.numeric_lower), float(self.numeric_upper))
+		return context.random.uniform(self._float_lower, self._float_upper)
 
 	def _get_random_outside(self, context: 'TestContext') -> float:
 		r = 14  # generate fake numbers up to this scale
-		d = float(self.numeric_upper - self.numeric_lower)
-		off = context.random.uniform(10 ** -r, (10 ** r) * d)
+		off = context.random.uniform(10 ** -r, (10 ** r) * self._float_range)
 
 		return context.random.choice((
-			float(self.numeric_lower) - off,
-			float(self.numeric_upper) + off
+			self._float_lower - off,
+			self._float_upper + off
 		))
 
 	def get_random_choice(self, context: 'TestContext'):
@@ -445,8 +470,8 @@ class ClozeQuestionNumericGap(ClozeQuestionGap):
 
 		if s is None:
 			g = context.random.choice((
-				lambda _: float(self.numeric_lower),
-				lambda _: float(self.numeric_upper),
+				lambda _: self._float_lower,
+				lambda _: self._float_upper,
 				self._get_random_inside,
 				self._get_random_outside
 			))
@@ -462,7 +487,7 @@ class ClozeQuestionNumericGap(ClozeQuestionGap):
 			n = float(text)
 			n = float(self._format_number(n, context))  # limit to number of representable digits
 
-			if float(self.numeric_lower) <= n <= float(self.numeric_upper):
+			if self._float_lower <= n <= self._float_upper:
 				return self.score
 			else:
 				return Decimal(0)
@@ -483,45 +508,82 @@ class ClozeQuestionNumericGap(ClozeQuestionGap):
 			return False
 
 	def get_type(self):
-		return ClozeType.numeric
-
-
-def parse_gap_size(driver, gap_index):
-	element = driver.find_element_by_name("gap_%d_gapsize" % gap_index)
-	text = element.get_attribute("value").strip()
+		return self.type
+
+
+# reads all scoring settings of a cloze question from the edit form in one go, as every single
+# WebDriver lookup is a separate round-trip. missing fields are reported as null.
+_GET_UI_JS = """
+	function value(name) {
+		var element = document.getElementsByName(name)[0];
+		return element ? element.value : null;
+	}
+
+	var gaps = [];
+	for (var i = 0; ; i++) {
+		var clozeType = value('clozetype_' + i);
+		if (clozeType === null) {
+			break;
+		}
+
+		var options = [];
+		for (var j = 0; ; j++) {
+			var answer = document.getElementById('gap_' + i + '[answer][' + j + ']');
+			if (!answer) {
+				break;
+			}
+			var points = document.getElementById('gap_' + i + '[points][' + j + ']');
+			options.push([answer.value, points.value]);
+		}
+
+		gaps.push({
+			cloze_type: clozeType,
+			size: value('gap_' + i + '_gapsize'),
+			options: options,
+			numeric_value: value('gap_' + i + '_numeric'),
+			numeric_lower: value('gap_' + i + '_numeric_lower'),
+			numeric_upper: value('gap_' + i + '_numeric_upper'),
+			numeric_points: value('gap_' + i + '_numeric_points')
+		});
+	}
+
+	return {
+		fixed_text_length: value('fixedTextLength'),
+		gaps: gaps,
+		identical_scoring: document.getElementsByName('identical_scoring')[0].checked,
+		comparator: document.querySelector('#textgap_rating option[selected]').value
+	};
+"""
+
+
+def parse_gap_size(gap_ui: Dict) -> int:
+	text = gap_ui["size"]
 	assert isinstance(text, str)
+	text = text.strip()
 	if text == '':
 		return None
 	else:
 		return int(text)
 
 
-def parse_numeric_gap_scoring(driver: selenium.webdriver.Remote, gap_index: int) -> Dict:
-	value = Decimal(driver.find_element_by_name("gap_%d_numeric" % gap_index).get_attribute("value"))
-	lower = Decimal(driver.find_element_by_name("gap_%d_numeric_lower" % gap_index).get_attribute("value"))
-	upper = Decimal(driver.find_element_by_name("gap_%d_numeric_upper" % gap_index).get_attribute("value"))
-	score = Decimal(driver.find_element_by_name("gap_%d_numeric_points" % gap_index).get_attribute("value"))
+def parse_numeric_gap_scoring(gap_ui: Dict) -> Dict:
+	value = Decimal(gap_ui["numeric_value"])
+	lower = Decimal(gap_ui["numeric_lower"])
+	upper = Decimal(gap_ui["numeric_upper"])
+	score = Decimal(gap_ui["numeric_points"])
 	return dict(value=value, lower=lower, upper=upper, score=score)
 
 
-def parse_gap_options(driver: selenium.webdriver.Remote, gap_index: int) -> Dict[str, Decimal]:
+def parse_gap_options(gap_ui: Dict) -> Dict[str, Decimal]:
 	options = dict()
 	seen = set()
 
-	while True:
-		try:
-			answer = driver.find_element_by_id("gap_%d[answer][%d]" % (gap_index, len(options)))
-		except NoSuchElementException:
-			break
-		points = driver.find_element_by_id("gap_%d[points][%d]" % (gap_index, len(options)))
-
-		answer_key = answer.get_attribute("value")
-
+	for answer_key, points in gap_ui["options"]:
 		if answer_key.strip() in seen:
 			raise InteractionException("the gap has multiple identical options named '%s'. unsupported." % answer_key)
 		seen.add(answer_key.strip())
 
-		options[answer_key] = Decimal(points.get_attribute("value"))
+		options[answer_key] = Decimal(points)
 
 	return options
 
@@ -591,19 +653,28 @@ class TextGapReadjuster(GapReadjuster):
 		return gap
 
 
+# reads the values of all consecutive gap_%d[answer][%d] inputs in one round trip instead of
+# probing each index (and the first missing one) through find_element_by_id().
+_GET_OPTION_ANSWERS_JS = """
+	var answers = [];
+	for (var i = 0; ; i++) {
+		var element = document.getElementById("gap_" + arguments[0] + "[answer][" + i + "]");
+		if (!element) {
+			break;
+		}
+		answers.push(element.value);
+	}
+	return answers;
+"""
+
+
 class TextGapReadjuster53(TextGapReadjuster):
 	def _get_option_answer_element(self, option_index):
 		return self.driver.find_element_by_id("gap_%d[answer][%d]" % (self.gap_index, option_index))
 
 	def _option_answers(self):
-		option_index = 0
-		while True:
-			try:
-				element = self._get_option_answer_element(option_index)
-				yield element.get_attribute("value").strip()
-			except NoSuchElementException:
-				break
-			option_index += 1
+		answers = self.driver.execute_script(_GET_OPTION_ANSWERS_JS, self.gap_index)
+		return [answer.strip() for answer in answers]
 
 	def _add_answer(self, option_index, option_key):
 		self.driver.find_element_by_name("add_gap_%d_%d" % (self.gap_index, option_index - 1)).click()
@@ -803,7 +874,9 @@ class TextGapReadjuster54(TextGapReadjuster):
 class ClozeQuestion(Question):
 	@staticmethod
 	def _get_ui(driver: selenium.webdriver.Remote) -> ClozeScoring:
-		fixed_text_length = driver.find_element_by_name("fixedTextLength").get_attribute("value").strip()
+		ui = driver.execute_script(_GET_UI_JS)
+
+		fixed_text_length = ui["fixed_text_length"].strip()
 		if fixed_text_length == '':
 			fixed_text_length = None
 		else:
@@ -811,25 +884,18 @@ class ClozeQuestion(Question):
 
 		gaps = list()
 
-		while True:
-			gap_index = len(gaps)
-
-			try:
-				cloze_type_element = driver.find_element_by_name("clozetype_%d" % gap_index)
-			except NoSuchElementException:
-				break
-
-			cloze_type = ClozeType(int(cloze_type_element.get_attribute("value")))
+		for gap_index, gap_ui in enumerate(ui["gaps"]):
+			cloze_type = ClozeType(int(gap_ui["cloze_type"]))
 
 			if cloze_type != ClozeType.select:
-				gap_size = parse_gap_size(driver, gap_index)
+				gap_size = parse_gap_size(gap_ui)
 				if gap_size is None:
 					gap_size = fixed_text_length
 			else:
 				gap_size = None
 
 			if cloze_type in (ClozeType.text, ClozeType.select):
-				options = parse_gap_options(driver, gap_index)
+				options = parse_gap_options(gap_ui)
 
 				if not options:
 					raise InteractionException("did not find gap options (%d)" % gap_index)
@@ -840,17 +906,16 @@ class ClozeQuestion(Question):
 			elif cloze_type == ClozeType.numeric:
 				scoring = NumericGapScoring(
 					cloze_type=ClozeType.numeric,
-					**parse_numeric_gap_scoring(driver, gap_index))
+					**parse_numeric_gap_scoring(gap_ui))
 
 			else:
 				raise NotImplementedException("unsupported cloze type " + str(cloze_type))
 
 			gaps.append(scoring)
 
-		identical_scoring = driver.find_element_by_name("identical_scoring").is_selected()
+		identical_scoring = ui["identical_scoring"]
 
-		comparator = ClozeComparator(driver.find_element_by_css_selector(
-			"#textgap_rating option[selected]").get_attribute("value"))
+		comparator = ClozeComparator(ui["comparator"])
 
 		return ClozeScoring(
 			identical_scoring=identical_scoring,
@@ -935,6 +1000,16 @@ class ClozeQuestion(Question):
 
 	def _create_gaps(self):
 		self.gaps = _create_gaps(self.scoring)
+		self._gap_list = tuple(self.gaps.values())
+		self._gap_types = tuple(set(gap.type for gap in self._gap_list))
+		self._gaps_by_export_name = dict()  # by language
+
+	def _get_gaps_by_export_name(self, language: str) -> Dict[str, ClozeQuestionGap]:
+		gaps = self._gaps_by_export_name.get(language)
+		if gaps is None:
+			gaps = dict((gap.get_export_name(language), gap) for gap in self.gaps.values())
+			self._gaps_by_export_name[language] = gaps
+		return gaps
 
 	def __init__(self, driver, title, settings):
 		super().__init__(title)
@@ -954,9 +1029,7 @@ class ClozeQuestion(Question):
 			gap.initialize_coverage(self, coverage, context)
 
 	def add_export_coverage(self, coverage, answers, language: str):
-		gaps = dict()
-		for gap in self.gaps.values():
-			gaps[gap.get_export_name(language)] = self.gaps[gap.index]
+		gaps = self._get_gaps_by_export_name(language)
 		for gap_name, value in answers.items():
 			gaps[gap_name].add_coverage(self, "export", coverage, str(value))
 
@@ -971,42 +1044,57 @@ class ClozeQuestion(Question):
 			return s.casefold()
 
 	def _is_empty_answer(self, answer, context) -> bool:
-		answer = context.strip_whitespace(answer)
-		return len(answer) == 0
+		if not answer:
+			return True
+		elif answer.strip():
+			return False  # not empty, no matter how whitespace gets stripped
+		else:
+			# whitespace only; whether this counts as empty depends on the workarounds.
+			return len(context.strip_whitespace(answer)) == 0
 
 	def get_random_answer(self, context):
+		random = context.random.random
+		random_choice = context.random.choice
+		is_empty_answer = self._is_empty_answer
+		previous_answers_p = float(context.settings.cloze_previous_answer_p)
+
 		while True:
 			answers = dict()
 			valid = dict()
 
-			previous_answers = defaultdict(set)
-			previous_answers_p = float(context.settings.cloze_previous_answer_p)
+			previous_answers = dict((gap_type, set()) for gap_type in self._gap_types)
+			previous_answers_list = dict((gap_type, []) for gap_type in self._gap_types)  # in insertion order
 			all_empty = True
 
-			shuffled_gaps = list(self.gaps.values())
+			shuffled_gaps = list(self._gap_list)
 			context.random.shuffle(shuffled_gaps)  # randomize our "previous" value logic
 
 			for gap in shuffled_gaps:
-				previous = previous_answers[gap.get_type()]
+				gap_type = gap.type
+				previous = previous_answers[gap_type]
+				previous_list = previous_answers_list[gap_type]
+				is_valid_answer = gap.is_valid_answer
 				choice = None
 
-				if len(previous) > 0 and context.random.random() < previous_answers_p:
+				if previous_list and random() < previous_answers_p:
 					# use some previous answer to explicitly test identical_scoring
 					# option, though it's also tested through the case below.
-					choice = context.random.choice(list(previous))
+					choice = random_choice(previous_list)
 
 					# trying to set a select gap to some illegal value causes problems.
-					if not gap.is_valid_answer(choice):
+					if not is_valid_answer(choice):
 						choice = None
 
 				if choice is None:
 					choice, _ = gap.get_random_choice(context)
 
-				previous.add(choice)
+				if choice not in previous:
+					previous.add(choice)
+					previous_list.append(choice)
 
 				answers[gap.index] = choice
-				valid[gap.index] = gap.is_valid_answer(choice)
-				all_empty = all_empty and self._is_empty_answer(choice, context)
+				valid[gap.index] = is_valid_answer(choice)
+				all_empty = all_empty and is_empty_answer(choice, context)
 
 			if all_empty and context.workarounds.disallow_empty_answers:
 				pass  # retry
@@ -1096,38 +1184,45 @@ class ClozeQuestion(Question):
 		# normalize answers: "a " will score the same as "a".
 		answers = dict((k, v.strip()) for k, v in answers.items())
 
-		name_to_index = dict()
-		for gap in self.gaps.values():
-			name_to_index[gap.get_export_name(context.language)] = gap.index
+		gaps = self._get_gaps_by_export_name(context.language)
 
 		indexed_answers = dict()
 		for name, value in answers.items():
-			indexed_answers[name_to_index[name]] = value
+			indexed_answers[gaps[name].index] = value
 
 		return self.compute_score_by_indices(indexed_answers, context)
 
 	def compute_score_by_indices(self, answers: Dict[int, str], context: 'TestContext') -> Decimal:
 		score = Decimal(0)
+		gaps = self.gaps
 
 		if self.scoring.identical_scoring:
 			for index, text in answers.items():
-				score += self.gaps[index].get_score(text, context)
+				score += gaps[index].get_score(text, context)
 		else:
 			# make sure answers are sorted as self.identical_scoring won't be
 			# computed correctly otherwise.
-			sorted_answers = sorted(list(answers.items()), key=lambda x: int(x[0]))
+			sorted_answers = sorted(answers.items(), key=lambda x: int(x[0]))
+
+			fold = self.scoring.comparator == ClozeComparator.ignore_case and \
+				not context.workarounds.identical_scoring_ignores_comparator
 
 			given_answers = set()
 			for index, text in sorted_answers:
-				comparable_text = text
+				gap = gaps[index]
 
-				if not context.workarounds.identical_scoring_ignores_comparator:
-					if self.scoring.comparator == ClozeComparator.ignore_case:
-						comparable_text = text.casefold()
+				if fold:
+					comparable_text = text.casefold()
+				else:
+					comparable_text = text
 				if comparable_text in given_answers:
 					continue
 				given_answers.add(comparable_text)
 
-				score += self.gaps[index].get_score(text, context)
+				if fold and gap.type == ClozeType.text:
+					# text gaps share the question's comparator, so we can reuse the folded text.
+					score += gap.get_score_from_folded(comparable_text)
+				else:
+					score += gap.get_score(text, context)
 
 		return score
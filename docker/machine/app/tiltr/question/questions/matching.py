@@ -5,29 +5,36 @@
 # GPLv3, see LICENSE
 #
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from decimal import *
 from enum import Enum
 import itertools
+import functools
 import numpy
 import scipy.optimize
 from collections import defaultdict
 
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.support.select import Select
-from texttable import Texttable
 
 from tiltr.driver.utils import set_element_value
 from .question import Question
 
 
+# possible new scores and score deltas in readjustments, i.e. multiples of 0.25. note that
+# these are built via division to keep the exact same Decimal representation (e.g. "1" and
+# not "1.00") as computing them on the fly.
+_POSITIVE_SCORES = tuple(Decimal(i) / Decimal(4) for i in range(1, 9))
+_SCORE_DELTAS = tuple(Decimal(i) / Decimal(4) for i in range(-8, 9))
+
+
 def _readjust_score(random, score: Decimal, enforce_positive: bool) -> Decimal:
+	# randrange(n) draws the same random numbers as the former randint(1, 8) and randint(-8, 8).
 	if enforce_positive:
-		return Decimal(random.randint(1, 8)) / Decimal(4)
+		return _POSITIVE_SCORES[random.randrange(len(_POSITIVE_SCORES))]
 	else:
-		delta = Decimal(random.randint(-8, 8)) / Decimal(4)
-		return score + delta
+		return score + _SCORE_DELTAS[random.randrange(len(_SCORE_DELTAS))]
 
 
 def _one_to_one_simple(scores: Dict, explain=None) -> Decimal:  # simple, but not correct.
@@ -37,10 +44,34 @@ def _one_to_one_simple(scores: Dict, explain=None) -> Decimal:  # simple, but no
 	return sum(definition_scores.values())
 
 
+def _one_to_one_greedy(scores: Dict) -> Optional[Decimal]:
+	# if no score is negative and the best terms of all definitions are distinct, then picking
+	# the best term for each definition is a valid and optimal 1:1 matching. note that this does
+	# not hold in general (see _one_to_one_simple). returns None if the shortcut does not apply.
+
+	best = dict()
+	for (definition, term), score in scores.items():
+		if score < 0:
+			return None
+		if score > 0 and (definition not in best or score > best[definition][1]):
+			best[definition] = (term, score)
+
+	terms = [term for term, _ in best.values()]
+	if len(set(terms)) < len(terms):
+		return None
+
+	return sum((score for _, score in best.values()), Decimal(0))
+
+
 def _one_to_one_correct(scores: Dict, explain=None) -> Decimal:
 	# computing the maximum score for 1:1 matchings means computing the weighted bipartite
 	# matching for the underlying graph (also known as linear sum assignment problem).
 
+	if explain is None:
+		max_score = _one_to_one_greedy(scores)
+		if max_score is not None:
+			return max_score
+
 	definitions = set()
 	terms = set()
 	for (definition, term) in scores.keys():
@@ -51,9 +82,20 @@ def _one_to_one_correct(scores: Dict, explain=None) -> Decimal:
 
 	definitions = list(definitions) + [None]  # always allow not assigning a term at all
 	terms = list(terms)
-	cost = numpy.array(
-		[[float(m - scores.get((d, t), Decimal(0))) for t in terms] for d in definitions],
-		dtype=numpy.float64)
+
+	# pairs without a score (including the None definition) have a cost of m.
+	definition_index = dict((d, i) for i, d in enumerate(definitions))
+	term_index = dict((t, i) for i, t in enumerate(terms))
+	items = list(scores.items())
+	n = len(items)
+
+	rows = numpy.fromiter((definition_index[d] for (d, _), _ in items), dtype=numpy.intp, count=n)
+	cols = numpy.fromiter((term_index[t] for (_, t), _ in items), dtype=numpy.intp, count=n)
+	values = numpy.fromiter((float(m - s) for _, s in items), dtype=numpy.float64, count=n)
+
+	cost = numpy.full((len(definitions), len(terms)), float(m), dtype=numpy.float64)
+	cost[rows, cols] = values
+
 	row_ind, col_ind = scipy.optimize.linear_sum_assignment(cost)
 
 	max_score = Decimal(0)
@@ -68,6 +110,11 @@ def _one_to_one_correct(scores: Dict, explain=None) -> Decimal:
 	return max_score
 
 
+@functools.lru_cache(maxsize=256)
+def _one_to_one_correct_cached(scores: frozenset) -> Decimal:
+	return _one_to_one_correct(dict(scores))
+
+
 class MatchingMultiplicity(Enum):
 	ONE_TO_ONE = 1
 	MANY_TO_MANY = 2
@@ -80,6 +127,8 @@ def _compute_maximum_score(
 		if multiplicity == MatchingMultiplicity.ONE_TO_ONE:
 			if context.workarounds.allow_unreachable_max_scores:
 				return _one_to_one_simple(scores, explain)
+			elif explain is None:
+				return _one_to_one_correct_cached(frozenset(scores.items()))
 			else:
 				return _one_to_one_correct(scores, explain)
 		elif multiplicity == MatchingMultiplicity.MANY_TO_MANY:
@@ -90,6 +139,61 @@ def _compute_maximum_score(
 		return Decimal(0)
 
 
+class _PositiveScoreTracker:
+	# for both 1:1 and n:n matchings, the maximum score is positive if and only if some pair has
+	# a positive score. while building up new scores, that is all we need to know, so we keep a
+	# running count of positive scores instead of computing the maximum score.
+
+	def __init__(self, scores: Dict):
+		self.scores = scores
+		self._n_positive = sum(1 for score in scores.values() if score > 0)
+
+	def set(self, key, score: Decimal):
+		self._n_positive += int(score > 0) - int(self.scores.get(key, 0) > 0)
+		self.scores[key] = score
+
+	def has_positive_score(self) -> bool:
+		return self._n_positive > 0
+
+
+# for <select>s, .value is the currently selected option.
+_PAIRS_SELECTORS = (
+	'.matchingpairwizard tbody td select[name^="pairs[definition]"]',
+	'.matchingpairwizard tbody td select[name^="pairs[term]"]',
+	'.matchingpairwizard tbody td input[name^="pairs[points]"]'
+)
+
+_GET_PAIRS_JS = """
+	return arguments[0].map(function(selector) {
+		return Array.from(document.querySelectorAll(selector)).map(function(e, i) {
+			if (!e.getAttribute('name').endsWith('[' + i.toString() + ']')) {
+				throw 'item is out of order';
+			}
+			return e.value;
+		});
+	});
+"""
+
+# adds pairs in one go by clicking ILIAS' own add buttons (so that ILIAS' scripts create the new
+# rows) and then selecting definition and term in each new row.
+_ADD_PAIRS_JS = """
+	var index = arguments[0];
+	arguments[1].forEach(function(pair) {
+		document.getElementById('add_pairs[' + index + ']').click();
+		index += 1;
+
+		[['definition', pair[0]], ['term', pair[1]]].forEach(function(item) {
+			var select = document.querySelector('select[name="pairs[' + item[0] + '][' + index + ']"]');
+			select.value = item[1];
+			if (select.value !== item[1]) {
+				throw 'could not select ' + item[1];
+			}
+			select.dispatchEvent(new Event('change', {bubbles: true}));
+		});
+	});
+"""
+
+
 class MatchingQuestion(Question):
 	@staticmethod
 	def _ui_get_multiplicity(driver) -> MatchingMultiplicity:
@@ -107,22 +211,7 @@ class MatchingQuestion(Question):
 
 	@staticmethod
 	def _ui_get_pairs(driver):
-		css = (
-			('.matchingpairwizard tbody td select[name^="pairs[definition]"]', 'option[selected]'),
-			('.matchingpairwizard tbody td select[name^="pairs[term]"]', 'option[selected]'),
-			('.matchingpairwizard tbody td input[name^="pairs[points]', '')
-		 )
-
-		definitions, terms, points = driver.execute_script("""
-			return arguments[0].map(function(css) {
-				return $(css[0]).map(function(i, e) {
-					if (!e.getAttribute('name').endsWith('[' + i.toString() + ']')) {
-						throw 'item is out of order';
-					}
-					return $(this, css[1])[0].value;
-				});
-			});
-		""", css)
+		definitions, terms, points = driver.execute_script(_GET_PAIRS_JS, _PAIRS_SELECTORS)
 
 		return list(zip(zip(definitions, terms), points))
 
@@ -146,6 +235,25 @@ class MatchingQuestion(Question):
 
 	@staticmethod
 	def _ui_add_pairs(driver, keys):
+		keys = list(keys)
+		if not keys:
+			return
+
+		index = len(MatchingQuestion._ui_get_pair_indices(driver)) - 1
+
+		try:
+			driver.execute_script(_ADD_PAIRS_JS, index, keys)
+		except WebDriverException:
+			# the script might have failed halfway, leaving rows with default selections behind.
+			# remove all rows it added (highest index first, see _ui_remove_pairs), then fall back
+			# to adding the pairs one by one.
+			n_pairs = len(MatchingQuestion._ui_get_pair_keys(driver))
+			for i in range(n_pairs - 1, index, -1):
+				driver.find_element_by_id("remove_pairs[%d]" % i).click()
+			MatchingQuestion._ui_add_pairs_one_by_one(driver, keys)
+
+	@staticmethod
+	def _ui_add_pairs_one_by_one(driver, keys):
 		index = len(MatchingQuestion._ui_get_pair_indices(driver)) - 1
 
 		for definition, term in keys:
@@ -160,29 +268,35 @@ class MatchingQuestion(Question):
 
 	@staticmethod
 	def _ui_remove_pairs(driver, keys):
-		# the number ids of pairs change with each remove, so we need to refresh
-		# on each iteration.
-		for key in keys:
-			pairs = MatchingQuestion._ui_get_pair_indices(driver)
-			index_to_remove = pairs[key]
-			driver.find_element_by_id("remove_pairs[%d]" % index_to_remove).click()
+		# removing a pair renumbers all pairs after it (their indices shift down by one), while
+		# all pairs before it keep their index. removing in descending index order thus keeps
+		# the indices we fetched up front valid.
+		pairs = MatchingQuestion._ui_get_pair_indices(driver)
+		for key in sorted(keys, key=lambda k: pairs[k], reverse=True):
+			driver.find_element_by_id("remove_pairs[%d]" % pairs[key]).click()
 
 	def _ui_update_scores(self, driver, scores, context):
 		if context.ilias_version >= (5, 4):
-			definition_ids = dict((label, i) for i, label in self.definitions.items())
-			term_ids = dict((label, i) for i, label in self.terms.items())
+			definition_ids = self._definition_ids
+			term_ids = self._term_ids
 
 			seen_keys = set()
 
-			for tr in driver.find_elements_by_css_selector(".matchingpairwizard tbody tr"):
-				tds = list(tr.find_elements_by_css_selector("td"))
+			# fetch all rows in one go, as every single WebDriver lookup is a separate round-trip.
+			rows = driver.execute_script("""
+				return Array.from(document.querySelectorAll('.matchingpairwizard tbody tr')).map(function(tr) {
+					var tds = tr.querySelectorAll('td');
+					return [tds[0].innerText.trim(), tds[1].innerText.trim(), tds[2].querySelector('input')];
+				});
+			""")
 
-				definition_id = definition_ids[tds[0].text.strip()]
-				term_id = term_ids[tds[1].text.strip()]
+			for definition_label, term_label, points_element in rows:
+				definition_id = definition_ids[definition_label]
+				term_id = term_ids[term_label]
 
 				key = (definition_id, term_id)
 				score = scores[key]
-				set_element_value(driver, tds[2].find_element_by_css_selector("input"), str(score))
+				set_element_value(driver, points_element, str(score))
 
 				seen_keys.add(key)
 
@@ -207,24 +321,21 @@ class MatchingQuestion(Question):
 
 	@staticmethod
 	def _ui_get_items(driver, what):
-		def gather():
-			i = 0
-
-			while True:
-				values = list()
-
-				try:
-					for s in ('identifier', 'answer'):
-						values.append(driver.find_element_by_name(
-							'%s[%s][%d]' % (what, s, i)).get_attribute('value'))
-				except NoSuchElementException:
-					break
-
-				yield tuple(values)
-
-				i += 1
-
-		return dict(gather())
+		items = driver.execute_script("""
+			var what = arguments[0];
+			var items = [];
+			for (var i = 0; ; i++) {
+				var identifier = document.getElementsByName(what + '[identifier][' + i + ']')[0];
+				var answer = document.getElementsByName(what + '[answer][' + i + ']')[0];
+				if (!identifier || !answer) {
+					break;
+				}
+				items.push([identifier.value, answer.value]);
+			}
+			return items;
+		""", what)
+
+		return dict(map(tuple, items))
 
 	def __init__(self, driver, title, settings):
 		super().__init__(title)
@@ -234,6 +345,9 @@ class MatchingQuestion(Question):
 		self.terms = self._ui_get_items(driver, 'terms')
 		self.scores = self._ui_get_scores(driver)
 
+		self._definition_ids = dict((label, i) for i, label in self.definitions.items())
+		self._term_ids = dict((label, i) for i, label in self.terms.items())
+
 	def get_maximum_score(self, context):
 		return _compute_maximum_score(self.scores, self.multiplicity, context)
 
@@ -291,6 +405,7 @@ class MatchingQuestion(Question):
 			return False, list()
 
 		new_scores = dict()
+		new_scores_tracker = _PositiveScoreTracker(new_scores)
 
 		all_pairs = set((d, t) for d, t in itertools.product(
 			self.definitions.keys(), self.terms.keys()))
@@ -316,14 +431,13 @@ class MatchingQuestion(Question):
 
 			if action == 'keep':
 				# keep pair and score as is
-				new_scores[(definition, term)] = score
+				new_scores_tracker.set((definition, term), score)
 				changes[(definition, term)] = (score, score)
 			elif action == 'adjust':
 				# adjust score of existing pair (might get adjusted to 0)
-				enforce_positive = _compute_maximum_score(
-					new_scores, self.multiplicity, context) <= Decimal(0)
-				new_scores[(definition, term)] = _readjust_score(
-					context.random, score, enforce_positive)
+				enforce_positive = not new_scores_tracker.has_positive_score()
+				new_scores_tracker.set((definition, term), _readjust_score(
+					context.random, score, enforce_positive))
 				changes[(definition, term)] = (
 					score,
 					new_scores[(definition, term)])
@@ -346,9 +460,9 @@ class MatchingQuestion(Question):
 			for _ in range(n_to_add):
 				new_definition, new_term = context.random.choice(list(unused_pairs))
 				unused_pairs.remove((new_definition, new_term))
-				enforce_positive = _compute_maximum_score(new_scores, self.multiplicity, context) <= Decimal(0)
-				new_scores[(new_definition, new_term)] = _readjust_score(
-					context.random, Decimal(0), enforce_positive)
+				enforce_positive = not new_scores_tracker.has_positive_score()
+				new_scores_tracker.set((new_definition, new_term), _readjust_score(
+					context.random, Decimal(0), enforce_positive))
 
 				if (new_definition, new_term) in changes:
 					removed.remove((definition, term))
@@ -360,15 +474,9 @@ class MatchingQuestion(Question):
 						"n/a",
 						new_scores[(new_definition, new_term)])
 
-		table = Texttable()
-		table.set_deco(Texttable.HEADER)
-		table.set_cols_dtype(['t', 'a', 'a'])
-		table.add_row(['', 'old', 'readjusted'])
 		for (definition, term), (old_score, new_score) in changes.items():
-			key_as_str = '("%s", "%s")' % (
-				self.definitions[definition], self.terms[term])
-			table.add_row([key_as_str, old_score, new_score])
-		report(table)
+			report('("%s", "%s"): %s -> %s' % (
+				self.definitions[definition], self.terms[term], old_score, new_score))
 
 		self._ui_update_scores(driver, new_scores, context)
 		self.scores = new_scores
@@ -386,15 +494,9 @@ class MatchingQuestion(Question):
 		return score
 
 	def compute_score_from_result(self, result, context) -> Decimal:
-		definition_ids = dict((label, i) for i, label in self.definitions.items())
-		term_ids = dict((label, i) for i, label in self.terms.items())
-
 		answers = defaultdict(set)
-		for key, value in result.properties.items():
-			if key[0] == "question" and key[1] == self.title and key[2] == "answer":
-				definition_label = key[3]
-				term_label = key[4]
-				answers[definition_ids[definition_label]].add(term_ids[term_label])
+		for (definition_label, term_label), value in result.gather(("question", self.title, "answer")).items():
+			answers[self._definition_ids[definition_label]].add(self._term_ids[term_label])
 
 		return self.compute_score(answers, context)
 
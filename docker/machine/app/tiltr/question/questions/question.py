@@ -41,10 +41,8 @@ class Question:
 
 	def compute_score_from_result(self, result, context: 'TestContext'):
 		answers = dict()
-		for key, value in result.properties.items():
-			if key[0] == "question" and key[1] == self.title and key[2] == "answer":
-				dimension = key[3]
-				answers[dimension] = value
+		for dimensions, value in result.gather(("question", self.title, "answer")).items():
+			answers[dimensions[0]] = value
 		return self.compute_score(answers, context)
 
 	def has_xls_score(self):